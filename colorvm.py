@@ -1,591 +1,1162 @@
-import argparse
-import pathlib
-
-from itertools import zip_longest
-from PIL import Image
-from rich.style import Style
-from rich.table import Table
-from rich.console import Console
-from rich.text import Text
-
-#
-# Pollock image format definition
-# First pixel of the first cell: [major version, minor version, cell size]
-# First pixel of the second cell: [tnol % 16777216, tnol % 65536, tnol % 256], where tnol = total number of lines - 2
-#  We do not need to count the first two elements, since they are the meta info
-#
-# If the number of lines is 0 or 1, we have a vertical image, due to flooring sqrt!
-# After acquiring the metadata, any pixel is good from the cell to get the 3 channel instructions (v1.0)
-#
-# Known issues:
-#
-
-#
-# Version info
-#
-V_MAJOR = 1
-V_MINOR = 0
-
-#
-# VM operating states
-#  OVERRUN is when the execution jumps out from the array
-#  AWAIT is when a color thread waits for data to arrive to the alpha channel
-#
-LOADING = 1
-RUNNING = 2
-AWAIT = 3
-HALTED = 4
-OVERRUN = 5
-
-#
-# Rich styles for different outputs
-#
-red_style = Style(color="red3", bold=True)
-green_style = Style(color="dark_green", bold=True)
-blue_style = Style(color="deep_sky_blue4", bold=True)
-alpha_style = Style(color="grey70", bold=True)
-table_info_style = Style(color="grey85")
-debug_style = Style(color="dark_orange", italic=True)
-message_style = Style(color="yellow2")
-important_style = Style(color="purple3", bold=True)
-gendebug_style = Style(color="grey50", italic=True)
-console = Console(highlight=False)
-
-# Color styles dictionary
-colorstyles: dict[str, Style] = {
-    "r": red_style,
-    "g": green_style,
-    "b": blue_style
-}
-# Thread state reverse dictionary
-statereverse: dict[int, str] = {
-    1: "LOADING",
-    2: "RUNNING",
-    3: "AWAIT",
-    4: "HALTED",
-    5: "OVERRUN"
-}
-# The stack of the color threads, alpha (a) is the global communication channel
-colorstack: dict[str, list[int]] = {
-    'r': [],
-    'g': [],
-    'b': [],
-    'a': []
-}
-# The code arrays of the color threads
-colorcode: dict[str, list[int]] = {
-    'r': [],
-    'g': [],
-    'b': []
-}
-# The execution states of the color threads
-colorstate: dict[str, int] = {
-    'r': LOADING,
-    'g': LOADING,
-    'b': LOADING
-}
-# The instruction pointers of the color threads
-colorip: dict[str, int] = {
-    'r': 0,
-    'g': 0,
-    'b': 0
-}
-# Statistics for each color thread
-colorstat: dict[str, dict[str, int]] = {
-    'r': {
-        "push": 0,
-        "add": 0,
-        "sub": 0,
-        "mul": 0,
-        "div": 0,
-        "rem": 0,
-        "pop": 0,
-        "swap": 0,
-        "dup": 0,
-        "rot": 0,
-        "not": 0,
-        "or": 0,
-        "and": 0,
-        "gt": 0,
-        "eq": 0,
-        "lt": 0,
-        "nop": 0,
-        "halt": 0,
-        "jmpz": 0,
-        "jmpnz": 0,
-        "outc": 0,
-        "inc": 0,
-        "outi": 0,
-        "ini": 0,
-        "pusha": 0,
-        "waita": 0,
-        "neg": 0,
-        "shl": 0,
-        "shr": 0
-    },
-    'g': {
-        "push": 0,
-        "add": 0,
-        "sub": 0,
-        "mul": 0,
-        "div": 0,
-        "rem": 0,
-        "pop": 0,
-        "swap": 0,
-        "dup": 0,
-        "rot": 0,
-        "not": 0,
-        "or": 0,
-        "and": 0,
-        "gt": 0,
-        "eq": 0,
-        "lt": 0,
-        "nop": 0,
-        "halt": 0,
-        "jmpz": 0,
-        "jmpnz": 0,
-        "outc": 0,
-        "inc": 0,
-        "outi": 0,
-        "ini": 0,
-        "pusha": 0,
-        "waita": 0,
-        "neg": 0,
-        "shl": 0,
-        "shr": 0
-    },
-    'b': {
-        "push": 0,
-        "add": 0,
-        "sub": 0,
-        "mul": 0,
-        "div": 0,
-        "rem": 0,
-        "pop": 0,
-        "swap": 0,
-        "dup": 0,
-        "rot": 0,
-        "not": 0,
-        "or": 0,
-        "and": 0,
-        "gt": 0,
-        "eq": 0,
-        "lt": 0,
-        "nop": 0,
-        "halt": 0,
-        "jmpz": 0,
-        "jmpnz": 0,
-        "outc": 0,
-        "inc": 0,
-        "outi": 0,
-        "ini": 0,
-        "pusha": 0,
-        "waita": 0,
-        "neg": 0,
-        "shl": 0,
-        "shr": 0
-    }
-}
-# The colors
-colors = ["r", "g", "b"]
-# Wait stack to avoid await race condition
-waitstack = []
-# The disassembly dictionary
-disasmdict: dict[int, str] = {
-    0b1000_0000: "add",
-    0b1000_0100: "sub",
-    0b1000_1000: "mul",
-    0b1000_1100: "div",
-    0b1001_0000: "rem",
-    0b1001_0100: "pop",
-    0b1001_1000: "swap",
-    0b1001_1100: "dup",
-    0b1010_0000: "rot",
-    0b1010_0100: "not",
-    0b1010_1000: "or",
-    0b1010_1100: "and",
-    0b1011_0000: "gt",
-    0b1011_0100: "eq",
-    0b1011_1000: "lt",
-    0b1011_1100: "nop",
-    0b1100_0000: "halt",
-    0b1100_0100: "jmpz",
-    0b1100_1000: "jmpnz",
-    0b1100_1100: "outc",
-    0b1101_0000: "inc",
-    0b1101_0100: "outi",
-    0b1101_1000: "ini",
-    0b1101_1100: "pusha",
-    0b1110_0000: "waita",
-    0b1110_0100: "neg",
-    0b1110_1000: "shl",
-    0b1110_1100: "shr"
-}
-
-def mesg(instring: str):
-    global args
-    if args.silent is False:
-        console.print(f"INFO: {instring}", style=message_style)
-
-
-def debuglog(instring: str, linestyle: Style):
-    global args
-    debug_header = Text()
-    debug_header.append("DEBUG: ", style=debug_style)
-    debug_header.append(f"{instring}", style=linestyle)
-    if args.debug is True:
-        console.print(debug_header)
-
-
-def colorexec(colortoexec: str):
-    global args
-    if 0 <= colorcode[colortoexec][colorip[colortoexec]] <= 127 :
-        debuglog(f"  Instruction: push {str(colorcode[colortoexec][colorip[colortoexec]])}", colorstyles[colortoexec])
-        colorstack[colortoexec].append(colorcode[colortoexec][colorip[colortoexec]])
-        colorstat[colortoexec]["push"] += 1
-    else:
-        debuglog(f"  Instruction: {disasmdict.get(colorcode[colortoexec][colorip[colortoexec]])}", colorstyles[colortoexec])
-        match colorcode[colortoexec][colorip[colortoexec]]:
-            case int(0b1000_0000):
-                # add
-                if len(colorstack[colortoexec]) >= 2:
-                    colorstack[colortoexec].append(colorstack[colortoexec].pop() + colorstack[colortoexec].pop())
-                colorstat[colortoexec]["add"] += 1
-            case int(0b1000_0100):
-                # sub
-                if len(colorstack[colortoexec]) >= 2:
-                    colorstack[colortoexec].append(colorstack[colortoexec].pop() - colorstack[colortoexec].pop())
-                colorstat[colortoexec]["sub"] += 1
-            case int(0b1000_1000):
-                # mul
-                if len(colorstack[colortoexec]) >= 2:
-                    colorstack[colortoexec].append(colorstack[colortoexec].pop() * colorstack[colortoexec].pop())
-                colorstat[colortoexec]["mul"] += 1
-            case int(0b1000_1100):
-                # div
-                if len(colorstack[colortoexec]) >= 2:
-                    colorstack[colortoexec].append(int(colorstack[colortoexec].pop() // colorstack[colortoexec].pop()))
-                colorstat[colortoexec]["div"] += 1
-            case int(0b1001_0000):
-                # rem
-                if len(colorstack[colortoexec]) >= 2:
-                    colorstack[colortoexec].append(int(colorstack[colortoexec].pop() % colorstack[colortoexec].pop()))
-                colorstat[colortoexec]["rem"] += 1
-            case int(0b1001_0100):
-                # pop
-                if len(colorstack[colortoexec]) >= 1:
-                    _ = colorstack[colortoexec].pop()
-                colorstat[colortoexec]["pop"] += 1
-            case int(0b1001_1000):
-                # swap
-                if len(colorstack[colortoexec]) >= 2:
-                    a = colorstack[colortoexec].pop()
-                    b = colorstack[colortoexec].pop()
-                    colorstack[colortoexec].append(a)
-                    colorstack[colortoexec].append(b)
-                colorstat[colortoexec]["swap"] += 1
-            case int(0b1001_1100):
-                # dup
-                if len(colorstack[colortoexec]) >= 1:
-                    a = colorstack[colortoexec].pop()
-                    colorstack[colortoexec].append(a)
-                    colorstack[colortoexec].append(a)
-                colorstat[colortoexec]["dup"] += 1
-            case int(0b1010_0000):
-                # rot
-                if len(colorstack[colortoexec]) >= 1:
-                    torot = int(colorstack[colortoexec].pop())
-                    if len(colorstack[colortoexec]) >= torot:
-                        extract = colorstack[colortoexec].pop()
-                        # We pop the last element and insert it into the length-1 (list starts with 0) minus rot-2 (one less element) position
-                        colorstack[colortoexec].insert((len(colorstack[colortoexec])-1)-(torot-2), extract)
-                colorstat[colortoexec]["rot"] += 1
-            case int(0b1010_0100):
-                # not
-                if len(colorstack[colortoexec]) >= 1:
-                    colorstack[colortoexec].append(int(~ colorstack[colortoexec].pop()))
-                colorstat[colortoexec]["not"] += 1
-            case int(0b1010_1000):
-                # or
-                if len(colorstack[colortoexec]) >= 2:
-                    colorstack[colortoexec].append(int(colorstack[colortoexec].pop() | colorstack[colortoexec].pop()))
-                colorstat[colortoexec]["or"] += 1
-            case int(0b1010_1100):
-                # and
-                if len(colorstack[colortoexec]) >= 2:
-                    colorstack[colortoexec].append(int(colorstack[colortoexec].pop() & colorstack[colortoexec].pop()))
-                colorstat[colortoexec]["and"] += 1
-            case int(0b1011_0000):
-                # gt
-                if len(colorstack[colortoexec]) >= 2:
-                    a = int(colorstack[colortoexec].pop())
-                    b = int(colorstack[colortoexec].pop())
-                    colorstack[colortoexec].append(1 if a > b else 0)
-                colorstat[colortoexec]["gt"] += 1
-            case int(0b1011_0100):
-                # eq
-                if len(colorstack[colortoexec]) >= 2:
-                    a = int(colorstack[colortoexec].pop())
-                    b = int(colorstack[colortoexec].pop())
-                    colorstack[colortoexec].append(1 if a == b else 0)
-                colorstat[colortoexec]["eq"] += 1
-            case int(0b1011_1000):
-                # lt
-                if len(colorstack[colortoexec]) >= 2:
-                    a = int(colorstack[colortoexec].pop())
-                    b = int(colorstack[colortoexec].pop())
-                    colorstack[colortoexec].append(1 if a < b else 0)
-                colorstat[colortoexec]["lt"] += 1
-            case int(0b1100_0100):
-                # jmpz
-                if len(colorstack[colortoexec]) >= 2:
-                    value = int(colorstack[colortoexec].pop())
-                    address = int(colorstack[colortoexec].pop())
-                    if value == 0:
-                        if 0 <= address < size:
-                            # The new address should be 1 less, since we are adding 1 to it in the main sequence
-                            colorip[colortoexec] = address - 1
-                        else:
-                            # We already overrun. The new address should be 1 less, then the size, since
-                            # we are adding 1 to it in the main sequence, and we should reach size to show state overrun.
-                            colorip[colortoexec] = size - 1
-                colorstat[colortoexec]["jmpz"] += 1
-            case int(0b1100_1000):
-                # jmpnz
-                if len(colorstack[colortoexec]) >= 2:
-                    value = int(colorstack[colortoexec].pop())
-                    address = int(colorstack[colortoexec].pop())
-                    if value != 0:
-                        if 0 <= address < size:
-                            # The new address should be 1 less, since we are adding 1 to it in the main sequence
-                            colorip[colortoexec] = address - 1
-                        else:
-                            # We already overrun. The new address should be 1 less, then the size, since
-                            # we are adding 1 to it in the main sequence, and we should reach size to show state overrun.
-                            colorip[colortoexec] = size - 1
-                colorstat[colortoexec]["jmpnz"] += 1
-            case int(0b1100_1100):
-                # outc
-                if len(colorstack[colortoexec]) >= 1:
-                    char=str(chr(colorstack[colortoexec].pop()))
-                    if char.isascii() is True :
-                        print(f"{char}")
-                colorstat[colortoexec]["outc"] += 1
-            case int(0b1101_0000):
-                # inc
-                char=input(f"Char input for channel '{colortoexec}': ")
-                colorstack[colortoexec].append(ord(char[0]))
-                colorstat[colortoexec]["inc"] += 1
-            case int(0b1101_0100):
-                # outi
-                if len(colorstack[colortoexec]) >= 1:
-                    number=int(colorstack[colortoexec].pop())
-                    print(f"{number}")
-                colorstat[colortoexec]["outi"] += 1
-            case int(0b1101_1000):
-                # ini
-                value=input(f"Integer input for channel '{colortoexec}': ")
-                if value.isdecimal() is True :
-                    colorstack[colortoexec].append(int(value))
-                colorstat[colortoexec]["ini"] += 1
-            case int(0b1101_1100):
-                # pusha
-                if len(colorstack[colortoexec]) >= 1:
-                    colorstack['a'].append(colorstack[colortoexec].pop())
-                colorstat[colortoexec]["pusha"] += 1
-            case int(0b1110_0000):
-                # waita
-                if len(colorstack['a']) >= 1:
-                    colorstack[colortoexec].append(colorstack['a'].pop())
-                    colorstate[colortoexec] = RUNNING
-                else:
-                    # We have to stay at the same place, so the new address should be 1 less, since we are adding 1 to it in the main sequence
-                    colorstate[colortoexec] = AWAIT
-                    waitstack.append(colortoexec)
-                    colorip[colortoexec] -= 1
-                colorstat[colortoexec]["waita"] += 1
-            case int(0b1110_0100):
-                # neg
-                if len(colorstack[colortoexec]) >= 1:
-                    colorstack[colortoexec].append(int(0 - colorstack[colortoexec].pop()))
-                colorstat[colortoexec]["neg"] += 1
-            case int(0b1110_1000):
-                # shl
-                if len(colorstack[colortoexec]) >= 2:
-                    shiftval = int(colorstack[colortoexec].pop())
-                    value = int(colorstack[colortoexec].pop())
-                    colorstack[colortoexec].append(int(value << shiftval))
-                colorstat[colortoexec]["shl"] += 1
-            case int(0b1110_1100):
-                # shr
-                if len(colorstack[colortoexec]) >= 2:
-                    shiftval = int(colorstack[colortoexec].pop())
-                    value = int(colorstack[colortoexec].pop())
-                    colorstack[colortoexec].append(int(value << shiftval))
-                colorstat[colortoexec]["shr"] += 1
-            case _:
-                mesg(f"Invalid instruction {colorcode[colortoexec][colorip[colortoexec]]} in '{colortoexec}' channel at {colorip[colortoexec]} position for ColorVM v{V_MAJOR}.{V_MINOR}.\nHalting channel '{colortoexec}'.")
-                colorstate[colortoexec] = HALTED
-    if args.debug is True:
-        stacktable = Table(title="Stack dump")
-        stacktable.add_column("Position", justify="left", style=table_info_style)
-        stacktable.add_column("r", justify="right", style=red_style)
-        stacktable.add_column("g", justify="right", style=green_style)
-        stacktable.add_column("b", justify="right", style=blue_style)
-        stacktable.add_column("a", justify="right", style=alpha_style)
-        for pos, sval in enumerate(zip_longest(colorstack["r"], colorstack["g"], colorstack["b"], colorstack["a"], fillvalue='-')):
-            stacktable.add_row(f"{pos}", f"{sval[0]}", f"{sval[1]}", f"{sval[2]}", f"{sval[3]}")
-        debuglog(f"", colorstyles[colortoexec])
-        console.print(stacktable)
-
-
-
-if __name__ == "__main__":
-
-    parser = argparse.ArgumentParser()
-    parser.add_argument('filename')
-    parser.add_argument('-b', '--bytedump', action='store_true', default=False, help='no execution, just dumping the bytearray in text')
-    parser.add_argument('-d', '--disasm', action='store_true', default=False, help='no execution, just disassembling the program')
-    parser.add_argument('-s', '--silent', action='store_true', default=False, help='silent run, no warnings or errors')
-    parser.add_argument('-t', '--statistics', action='store_true', default=False, help='display execution statistics after the termination of the VM')
-    parser.add_argument('-g', '--debug', action='store_true', default=False, help='provide detailed debug output')
-    args = parser.parse_args()
-
-    path = pathlib.Path(args.filename)
-
-    if path.exists() and path.is_file():
-        img = Image.open(path, mode='r')
-        imgxsize = img.size[0]
-        imgysize = img.size[1]
-        (majorver, minorver, cellsize) = img.getpixel((0, 0))
-        debuglog(f"Version: {majorver}.{minorver}, cellsize: {cellsize}", important_style)
-        if (majorver > V_MAJOR) or (majorver == V_MAJOR and minorver > V_MINOR):
-            mesg(f"Invalid version {majorver}.{minorver}, maximum supported: {V_MAJOR}.{V_MINOR}")
-            exit()
-        if imgxsize == cellsize:
-            (size3, size2, size1) = img.getpixel((0, cellsize))
-        else:
-            (size3, size2, size1) = img.getpixel((cellsize, 0))
-        size = size3 * 256 * 256 + size2 * 256 + size1
-        debuglog(f"Program size: {size}", important_style)
-        i = 1
-        match size:
-            case 0:
-                mesg(f"File {args.filename} length is zero.")
-                exit()
-            case 1:
-                x = 0
-                y = 2 * cellsize
-            case 2 | 3 | 4 | 5 | 6 :
-                x = 0
-                y = cellsize
-            case _:
-                x = 2 * cellsize
-                y = 0
-        # Reading the pixels into the code array
-        while i <= size:
-            (colorr, colorg, colorb) = img.getpixel((x, y))
-            colorcode['r'].append(colorr)
-            colorcode['g'].append(colorg)
-            colorcode['b'].append(colorb)
-            i += 1
-            x += cellsize
-            if x > imgxsize - 1:
-                x = 0
-                y += cellsize
-        # Bytedump mode
-        if args.bytedump is True:
-            i = 0
-            print(f"Dumping {args.filename}")
-            print(f"ColorVM version: {V_MAJOR}.{V_MINOR}")
-            print(f"Image file version: {majorver}.{minorver}, Cell size: {cellsize}\n")
-            while i < size:
-                print(f"Line {i}: [{colorcode["r"][i]}, {colorcode["g"][i]}, {colorcode["b"][i]}]")
-                i += 1
-            exit()
-        # Disasm mode
-        if args.disasm is True:
-            i = 0
-            print(f"#Disassembling {args.filename}")
-            print(f"#ColorVM version: {V_MAJOR}.{V_MINOR}")
-            print(f"#Image file version: {majorver}.{minorver}, Cell size: {cellsize}\n")
-            while i < size:
-                disasmr = "push " + str(colorcode["r"][i]) if disasmdict.get(colorcode["r"][i]) is None else disasmdict.get(colorcode["r"][i])
-                disasmg = "push " + str(colorcode["g"][i]) if disasmdict.get(colorcode["g"][i]) is None else disasmdict.get(colorcode["g"][i])
-                disasmb = "push " + str(colorcode["b"][i]) if disasmdict.get(colorcode["b"][i]) is None else disasmdict.get(colorcode["b"][i])
-                print(f"{disasmr:9}; {disasmg:9}; {disasmb:9} #Line {i}")
-                i += 1
-            exit()
-        # Changing state to RUNNING
-        for color in colors:
-            colorstate[color] = RUNNING
-        # Main sequence
-        terminate = False
-        while not terminate:
-            for color in colors:
-                if colorstate[color] == OVERRUN:
-                    debuglog(f"'{color}', State: {statereverse[colorstate[color]]}, IP: {colorip[color]}, Code data: N/A", colorstyles[color])
-                else:
-                    debuglog(f"'{color}', State: {statereverse[colorstate[color]]}, IP: {colorip[color]}, Code data: {colorcode[color][colorip[color]]}", colorstyles[color])
-                if colorstate[color] == RUNNING:
-                    match colorcode[color][colorip[color]]:
-                        # Checking for a nop instruction
-                        case(int(0b1011_1100)):
-                            colorstat[color]["nop"] += 1
-                            colorip[color] += 1
-                            if colorip[color] == size:
-                                colorstate[color] = OVERRUN
-                                debuglog(f"  Thread '{color}' overrun.", colorstyles[color])
-                        # Checking for a halt instruction
-                        case(int(0b1100_0000)):
-                            colorstat[color]["halt"] += 1
-                            colorstate[color] = HALTED
-                            debuglog(f"  Thread '{color}' halted.", colorstyles[color])
-                        case _:
-                            colorexec(color)
-                            colorip[color] += 1
-                            if colorip[color] == size:
-                                colorstate[color] = OVERRUN
-                                debuglog(f"  Thread '{color}' overrun.", colorstyles[color])
-                elif colorstate[color] == AWAIT and waitstack[0] == color:
-                    debuglog(f"  Thread '{color}' in AWAIT state (waitstack top: '{waitstack[0]}').", colorstyles[color])
-                    colorstat[color]["waita"] += 1
-                    if len(colorstack['a']) >= 1:
-                        debuglog(f"  Data found in 'a' stack.", colorstyles[color])
-                        _ = waitstack.pop(0)
-                        colorexec(color)
-                        colorip[color] += 1
-                        if colorip[color] == size:
-                            colorstate[color] = OVERRUN
-                            debuglog(f"  Thread '{color}' overrun.", colorstyles[color])
-            tmprun = 0
-            tmpawait = 0
-            for color in colors:
-                if colorstate[color] == RUNNING:
-                    tmprun += 1
-                elif colorstate[color] == AWAIT:
-                    tmpawait += 1
-            debuglog(f"Number of running threads: {tmprun}, await threads: {tmpawait}.", gendebug_style)
-            if tmprun == 0:
-                if tmpawait != 0:
-                    mesg("Thread deadlock. Exiting.")
-                    terminate = True
-                else:
-                    mesg("Threads halted. Exiting.")
-                    terminate = True
-        if args.statistics is True:
-            insttable = Table(title="Execution statistics")
-            insttable.add_column("Instruction", justify="left", style=table_info_style)
-            insttable.add_column("r", justify="right", style=red_style)
-            insttable.add_column("g", justify="right", style=green_style)
-            insttable.add_column("b", justify="right", style=blue_style)
-            instlines = []
-            for key in colorstat["r"].keys():
-                if colorstat["r"][key] != 0 or colorstat["g"][key] != 0 or colorstat["b"][key] != 0:
-                    instlines.append((key, colorstat["r"][key], colorstat["g"][key], colorstat["b"][key]))
-            instline_sorted = sorted(instlines, key=lambda instline: instline[0])
-            for line in instline_sorted:
-                insttable.add_row(f"{line[0]}", f"{line[1]}", f"{line[2]}", f"{line[3]}")
-            console.print(insttable)
-    else:
+import argparse
+import io
+import operator
+import pathlib
+import sys
+
+from collections import deque
+from itertools import zip_longest
+from typing import Callable
+import numpy as np
+try:
+    import numba
+except ImportError:
+    numba = None
+from PIL import Image
+from rich.style import Style
+from rich.table import Table
+from rich.console import Console
+from rich.text import Text
+
+#
+# Pollock image format definition
+# First pixel of the first cell: [major version, minor version, cell size]
+# First pixel of the second cell: [tnol % 16777216, tnol % 65536, tnol % 256], where tnol = total number of lines - 2
+#  We do not need to count the first two elements, since they are the meta info
+#
+# If the number of lines is 0 or 1, we have a vertical image, due to flooring sqrt!
+# After acquiring the metadata, any pixel is good from the cell to get the 3 channel instructions (v1.0)
+#
+# Known issues:
+#
+
+#
+# Version info
+#
+V_MAJOR = 1
+V_MINOR = 0
+
+#
+# Maximum stack depth of a color thread
+#
+STACK_MAX = 1 << 20
+
+#
+# Largest value an ini input can push, since the stacks store int64
+#
+INT64_MAX = (1 << 63) - 1
+
+#
+# VM operating states
+#  OVERRUN is when the execution jumps out from the array
+#  AWAIT is when a color thread waits for data to arrive to the alpha channel
+#
+LOADING = 1
+RUNNING = 2
+AWAIT = 3
+HALTED = 4
+OVERRUN = 5
+
+#
+# Rich styles for different outputs
+#
+red_style = Style(color="red3", bold=True)
+green_style = Style(color="dark_green", bold=True)
+blue_style = Style(color="deep_sky_blue4", bold=True)
+alpha_style = Style(color="grey70", bold=True)
+table_info_style = Style(color="grey85")
+debug_style = Style(color="dark_orange", italic=True)
+message_style = Style(color="yellow2")
+important_style = Style(color="purple3", bold=True)
+gendebug_style = Style(color="grey50", italic=True)
+console = Console(highlight=False)
+
+# Color styles dictionary
+colorstyles: dict[str, Style] = {
+    "r": red_style,
+    "g": green_style,
+    "b": blue_style
+}
+# Thread state reverse dictionary
+statereverse: dict[int, str] = {
+    1: "LOADING",
+    2: "RUNNING",
+    3: "AWAIT",
+    4: "HALTED",
+    5: "OVERRUN"
+}
+# The stacks of the color threads as preallocated int64 buffers plus stack
+# pointers, indexed through colorindex; 'a' (3) is the global communication channel
+stacks = np.zeros((4, STACK_MAX), dtype=np.int64)
+sps = np.zeros(4, dtype=np.int32)
+# Integer arithmetic wraps at 64 bits on both interpreters, so numpy's scalar
+# overflow warnings are noise rather than errors
+np.seterr(over='ignore')
+# The packed code cells (one uint8 row of r, g, b per cell, filled at load time)
+codecells = np.zeros((0, 3), dtype=np.uint8)
+# Per-channel copies of codecells, contiguous so each one is a dense run of
+# one byte per opcode (the columns of codecells are strided)
+colorcode: dict[str, np.ndarray] = {
+    'r': codecells[:, 0],
+    'g': codecells[:, 1],
+    'b': codecells[:, 2]
+}
+# The execution states of the color threads
+colorstate: dict[str, int] = {
+    'r': LOADING,
+    'g': LOADING,
+    'b': LOADING
+}
+# The instruction pointers of the color threads
+colorip: dict[str, int] = {
+    'r': 0,
+    'g': 0,
+    'b': 0
+}
+# Statistics counters, one row per color thread, indexed by instruction kind
+colorstats = np.zeros((3, 32), dtype=np.int64)
+# Kind index back to instruction name, for the statistics table
+kindnames: tuple[str, ...] = (
+    "add", "sub", "mul", "div", "rem", "pop", "swap", "dup", "rot", "not",
+    "or", "and", "gt", "eq", "lt", "nop", "halt", "jmpz", "jmpnz", "outc",
+    "inc", "outi", "ini", "pusha", "waita", "neg", "shl", "shr", "push"
+)
+# The colors
+colors = ["r", "g", "b"]
+# Stack/channel row of each color in the stacks buffer
+colorindex: dict[str, int] = {
+    'r': 0,
+    'g': 1,
+    'b': 2,
+    'a': 3
+}
+# Wait queue to avoid await race condition, popped from the left
+waitstack = deque()
+# The disassembly dictionary
+disasmdict: dict[int, str] = {
+    0b1000_0000: "add",
+    0b1000_0100: "sub",
+    0b1000_1000: "mul",
+    0b1000_1100: "div",
+    0b1001_0000: "rem",
+    0b1001_0100: "pop",
+    0b1001_1000: "swap",
+    0b1001_1100: "dup",
+    0b1010_0000: "rot",
+    0b1010_0100: "not",
+    0b1010_1000: "or",
+    0b1010_1100: "and",
+    0b1011_0000: "gt",
+    0b1011_0100: "eq",
+    0b1011_1000: "lt",
+    0b1011_1100: "nop",
+    0b1100_0000: "halt",
+    0b1100_0100: "jmpz",
+    0b1100_1000: "jmpnz",
+    0b1100_1100: "outc",
+    0b1101_0000: "inc",
+    0b1101_0100: "outi",
+    0b1101_1000: "ini",
+    0b1101_1100: "pusha",
+    0b1110_0000: "waita",
+    0b1110_0100: "neg",
+    0b1110_1000: "shl",
+    0b1110_1100: "shr"
+}
+#
+# Decoded instruction kinds
+#  Each code cell is pre-decoded at load time into a (kind, immediate) pair.
+#  Kinds are small contiguous ints so dispatch is plain list/array indexing;
+#  opcode kinds follow disasmdict order, which makes the kind (op - 128) >> 2
+#
+K_ADD = 0
+K_SUB = 1
+K_MUL = 2
+K_DIV = 3
+K_REM = 4
+K_POP = 5
+K_SWAP = 6
+K_DUP = 7
+K_ROT = 8
+K_NOT = 9
+K_OR = 10
+K_AND = 11
+K_GT = 12
+K_EQ = 13
+K_LT = 14
+K_NOP = 15
+K_HALT = 16
+K_JMPZ = 17
+K_JMPNZ = 18
+K_OUTC = 19
+K_INC = 20
+K_OUTI = 21
+K_INI = 22
+K_PUSHA = 23
+K_WAITA = 24
+K_NEG = 25
+K_SHL = 26
+K_SHR = 27
+K_PUSH = 28
+K_INVALID = 29
+K_OVERRUN = 30
+# Raw opcode byte to kind as a flat 256-entry table: valid opcodes are
+# 0b1xxxxx00, so their kind is just the bit field (op >> 2) & 31, everything
+# else stays K_INVALID
+kindtable = np.full(256, K_INVALID, dtype=np.int64)
+for op in disasmdict:
+    kindtable[op] = (op >> 2) & 31
+# The decoded (kind, immediate) cells of the color threads
+colordecoded: dict[str, list[tuple[int, int]]] = {
+    'r': [],
+    'g': [],
+    'b': []
+}
+# Compiled straight-line blocks per color, keyed by start address (see compileblocks)
+colorblocks: dict[str, dict[int, tuple[Callable[[int], None], int]]] = {
+    'r': {},
+    'g': {},
+    'b': {}
+}
+# Kinds that push one value onto the executing thread's stack the moment they
+# run; only these can hit the stack limit, so only they are guarded against it
+growkinds = frozenset((K_PUSH, K_DUP, K_INC, K_INI, K_WAITA))
+# Kinds that only touch the executing thread's own stack: anything made of
+# these can be compiled into a straight-line block
+blockkinds = frozenset((
+    K_ADD, K_SUB, K_MUL, K_DIV, K_REM, K_POP, K_SWAP, K_DUP, K_NOT, K_OR,
+    K_AND, K_GT, K_EQ, K_LT, K_NOP, K_NEG, K_SHL, K_SHR, K_PUSH
+))
+# Python expression for the result of each two-operand kind, with the old top
+# of the stack at stk[sp] and the second operand at stk[sp - 1]; division by
+# zero and shift counts outside 0..63 produce 0, matching the handlers and
+# the Numba fast path
+binoptext: dict[int, str] = {
+    K_ADD: "stk[sp] + stk[sp - 1]",
+    K_SUB: "stk[sp] - stk[sp - 1]",
+    K_MUL: "stk[sp] * stk[sp - 1]",
+    K_DIV: "stk[sp] // stk[sp - 1] if stk[sp - 1] != 0 else 0",
+    K_REM: "stk[sp] % stk[sp - 1] if stk[sp - 1] != 0 else 0",
+    K_OR: "stk[sp] | stk[sp - 1]",
+    K_AND: "stk[sp] & stk[sp - 1]",
+    K_GT: "1 if stk[sp] > stk[sp - 1] else 0",
+    K_EQ: "1 if stk[sp] == stk[sp - 1] else 0",
+    K_LT: "1 if stk[sp] < stk[sp - 1] else 0",
+    K_SHL: "stk[sp - 1] << stk[sp] if 0 <= stk[sp] <= 63 else 0",
+    K_SHR: "stk[sp - 1] >> stk[sp] if 0 <= stk[sp] <= 63 else 0"
+}
+#
+# Fast path (Numba) constants
+#  The compiled interpreter cannot do I/O or console output, so it returns a
+#  reason code whenever it has to hand control back to Python
+#
+R_HALT = 0
+R_DEADLOCK = 1
+R_IO = 2
+R_INVALID = 3
+R_STACKFULL = 4
+R_ALPHAFULL = 5
+
+# Buffered program output of the outc/outi instructions; flushed before any
+# input prompt, before console messages (to keep the interleaving) and at exit
+outbuf = io.StringIO()
+
+def flushout():
+    out = outbuf.getvalue()
+    if out:
+        sys.stdout.write(out)
+        sys.stdout.flush()
+        outbuf.seek(0)
+        outbuf.truncate()
+
+
+def mesg(instring: str):
+    flushout()
+    console.print(f"INFO: {instring}", style=message_style)
+
+
+def debuglog(instring: str, linestyle: Style):
+    flushout()
+    debug_header = Text()
+    debug_header.append("DEBUG: ", style=debug_style)
+    debug_header.append(f"{instring}", style=linestyle)
+    console.print(debug_header)
+
+
+def nolog(*ignored, **alsoignored):
+    pass
+
+
+def makeblock(cells: list[tuple[int, int]]) -> tuple[Callable[[int], None], int]:
+    # Generate one Python function that executes the given straight-line cells
+    # back to back on a channel's stack, with the same per-instruction
+    # underflow guards as the handlers, and batched statistics updates
+    lines = ["def block(ci):", "    sp = int(sps[ci])", "    stk = stacks[ci]"]
+    counts = [0] * len(kindnames)
+    for kind, imm in cells:
+        if kind == K_PUSH:
+            lines.append(f"    stk[sp] = {imm}")
+            lines.append("    sp += 1")
+        elif kind in binoptext:
+            lines.append("    if sp >= 2:")
+            lines.append("        sp -= 1")
+            lines.append(f"        stk[sp - 1] = {binoptext[kind]}")
+        elif kind == K_POP:
+            lines.append("    if sp >= 1:")
+            lines.append("        sp -= 1")
+        elif kind == K_SWAP:
+            lines.append("    if sp >= 2:")
+            lines.append("        stk[sp - 1], stk[sp - 2] = stk[sp - 2], stk[sp - 1]")
+        elif kind == K_DUP:
+            lines.append("    if sp >= 1:")
+            lines.append("        stk[sp] = stk[sp - 1]")
+            lines.append("        sp += 1")
+        elif kind == K_NOT:
+            lines.append("    if sp >= 1:")
+            lines.append("        stk[sp - 1] = ~ stk[sp - 1]")
+        elif kind == K_NEG:
+            lines.append("    if sp >= 1:")
+            lines.append("        stk[sp - 1] = 0 - stk[sp - 1]")
+        # K_NOP generates no stack work, only its counter update
+        counts[kind] += 1
+    lines.append("    sps[ci] = sp")
+    for kind, count in enumerate(counts):
+        if count != 0:
+            lines.append(f"    colorstats[ci, {kind}] += {count}")
+    namespace = {"sps": sps, "stacks": stacks, "colorstats": colorstats}
+    exec(compile("\n".join(lines), "<block>", "exec"), namespace)
+    return namespace["block"], len(cells)
+
+
+def compileblocks():
+    # Trace compilation for the pure Python interpreter: every maximal run of
+    # two or more stack-local instructions becomes one compiled function, so
+    # the main sequence executes the whole run in a single call
+    for color in colors:
+        decoded = colordecoded[color]
+        blocks = colorblocks[color]
+        start = None
+        for pc, (kind, imm) in enumerate(decoded):
+            if kind in blockkinds:
+                if start is None:
+                    start = pc
+            else:
+                # The overrun sentinel always closes the last run
+                if start is not None and pc - start >= 2:
+                    blocks[start] = makeblock(decoded[start:pc])
+                start = None
+
+
+def makedriver() -> Callable[[], None]:
+    # Partial evaluation of the Python interpreter driver: once the program is
+    # loaded, the unrolled round-robin source is generated with the program
+    # size baked in as a literal and compiled with exec, so every hot name in
+    # pyexec is a plain function local instead of a module global
+    channeltemplate = """
+        # Channel '{c}'
+        if state_{c} == RUNNING and skip_{c} != 0:
+            # A compiled block already did this turn's work; burning the
+            # leftover turns keeps the thread interleaving identical
+            skip_{c} -= 1
+        else:
+            if state_{c} == OVERRUN or ip_{c} == {size}:
+                debuglog(f"'{c}', State: {{statereverse[state_{c}]}}, IP: {{ip_{c}}}, Code data: N/A", {style})
+            else:
+                debuglog(f"'{c}', State: {{statereverse[state_{c}]}}, IP: {{ip_{c}}}, Code data: {{code_{c}[ip_{c}]}}", {style})
+            if state_{c} == RUNNING:
+                kind = decoded_{c}[ip_{c}][0]
+                # Hitting the overrun sentinel cell behind the last line
+                if kind == K_OVERRUN:
+                    state_{c} = OVERRUN
+                    debuglog(f"  Thread '{c}' overrun.", {style})
+                # Checking for a nop instruction
+                elif kind == K_NOP:
+                    colorstats[{ci}, K_NOP] += 1
+                    ip_{c} += 1
+                # Checking for a halt instruction
+                elif kind == K_HALT:
+                    colorstats[{ci}, K_HALT] += 1
+                    state_{c} = HALTED
+                    debuglog(f"  Thread '{c}' halted.", {style})
+                else:
+                    block = blocks_{c}.get(ip_{c})
+                    if block is not None and sps[{ci}] < STACK_MAX - 2 * block[1]:
+                        block[0]({ci})
+                        ip_{c} += block[1]
+                        skip_{c} = block[1] - 1
+                    else:
+                        colorip['{c}'] = ip_{c}
+                        colorexec('{c}')
+                        ip_{c} = colorip['{c}']
+                        state_{c} = colorstate['{c}']
+            elif state_{c} == AWAIT and waitstack[0] == '{c}':
+                debuglog(f"  Thread '{c}' in AWAIT state (waitstack top: '{{waitstack[0]}}').", {style})
+                colorstats[{ci}, K_WAITA] += 1
+                if sps[3] >= 1:
+                    debuglog(f"  Data found in 'a' stack.", {style})
+                    _ = waitstack.popleft()
+                    colorip['{c}'] = ip_{c}
+                    colorexec('{c}')
+                    ip_{c} = colorip['{c}']
+                    state_{c} = colorstate['{c}']
+"""
+    source = (
+        "def pyexec():\n"
+        "    for color in colors:\n"
+        "        colorstate[color] = RUNNING\n"
+        "    state_r, state_g, state_b = RUNNING, RUNNING, RUNNING\n"
+        "    ip_r, ip_g, ip_b = colorip['r'], colorip['g'], colorip['b']\n"
+        "    skip_r, skip_g, skip_b = 0, 0, 0\n"
+        "    code_r, code_g, code_b = colorcode['r'], colorcode['g'], colorcode['b']\n"
+        "    decoded_r, decoded_g, decoded_b = colordecoded['r'], colordecoded['g'], colordecoded['b']\n"
+        "    blocks_r, blocks_g, blocks_b = colorblocks['r'], colorblocks['g'], colorblocks['b']\n"
+        "    terminate = False\n"
+        "    while not terminate:\n"
+        + channeltemplate.format(c='r', ci=0, style='red_style', size=size)
+        + channeltemplate.format(c='g', ci=1, style='green_style', size=size)
+        + channeltemplate.format(c='b', ci=2, style='blue_style', size=size)
+        + "        tmprun = (state_r == RUNNING) + (state_g == RUNNING) + (state_b == RUNNING)\n"
+        "        tmpawait = (state_r == AWAIT) + (state_g == AWAIT) + (state_b == AWAIT)\n"
+        "        debuglog(f\"Number of running threads: {tmprun}, await threads: {tmpawait}.\", gendebug_style)\n"
+        "        if tmprun == 0:\n"
+        "            if tmpawait != 0:\n"
+        "                mesg(\"Thread deadlock. Exiting.\")\n"
+        "                terminate = True\n"
+        "            else:\n"
+        "                mesg(\"Threads halted. Exiting.\")\n"
+        "                terminate = True\n"
+        "    colorstate['r'], colorstate['g'], colorstate['b'] = state_r, state_g, state_b\n"
+        "    colorip['r'], colorip['g'], colorip['b'] = ip_r, ip_g, ip_b\n"
+    )
+    exec(compile(source, "<driver>", "exec"), globals())
+    return globals()["pyexec"]
+
+
+#
+# Opcode handlers
+#  Each handler gets the executing color plus its stack row index already looked
+#  up, so the hot path touches the global dicts only once per instruction. Stack
+#  work happens directly on the stacks buffer through sps.
+#
+def make_binop(op_fn: Callable[[int, int], int], kind: int) -> Callable[[str, int], None]:
+    # op_fn gets the old top of the stack as its first operand, matching the
+    # pop() order of the original per-opcode handlers
+    def binop(colortoexec: str, ci: int):
+        if sps[ci] >= 2:
+            sps[ci] -= 1
+            stacks[ci, sps[ci] - 1] = op_fn(stacks[ci, sps[ci]], stacks[ci, sps[ci] - 1])
+        colorstats[ci, kind] += 1
+    return binop
+
+
+def intdiv(dividend: int, divisor: int) -> int:
+    # Division by zero is defined to produce 0 on every execution path
+    if divisor == 0:
+        return 0
+    return dividend // divisor
+
+
+def intrem(dividend: int, divisor: int) -> int:
+    # Remainder by zero is defined to produce 0 on every execution path
+    if divisor == 0:
+        return 0
+    return dividend % divisor
+
+
+def shiftl(shiftval: int, value: int) -> int:
+    # Shift counts outside 0..63 are defined to produce 0 on every execution path
+    if shiftval < 0 or shiftval > 63:
+        return 0
+    return value << shiftval
+
+
+def shiftr(shiftval: int, value: int) -> int:
+    # Shift counts outside 0..63 are defined to produce 0 on every execution path
+    if shiftval < 0 or shiftval > 63:
+        return 0
+    return value >> shiftval
+
+
+def op_pop(colortoexec: str, ci: int):
+    if sps[ci] >= 1:
+        sps[ci] -= 1
+    colorstats[ci, K_POP] += 1
+
+
+def op_swap(colortoexec: str, ci: int):
+    if sps[ci] >= 2:
+        a = stacks[ci, sps[ci] - 1]
+        stacks[ci, sps[ci] - 1] = stacks[ci, sps[ci] - 2]
+        stacks[ci, sps[ci] - 2] = a
+    colorstats[ci, K_SWAP] += 1
+
+
+def op_dup(colortoexec: str, ci: int):
+    if sps[ci] >= 1:
+        stacks[ci, sps[ci]] = stacks[ci, sps[ci] - 1]
+        sps[ci] += 1
+    colorstats[ci, K_DUP] += 1
+
+
+def op_rot(colortoexec: str, ci: int):
+    if sps[ci] >= 1:
+        sps[ci] -= 1
+        torot = int(stacks[ci, sps[ci]])
+        if sps[ci] >= torot:
+            sps[ci] -= 1
+            extract = stacks[ci, sps[ci]]
+            # Insert position as with list.insert, clamped so torot < 2 degrades to an append
+            pos = sps[ci] + 1 - torot
+            if pos > sps[ci]:
+                pos = sps[ci]
+            stacks[ci, pos + 1:sps[ci] + 1] = stacks[ci, pos:sps[ci]]
+            stacks[ci, pos] = extract
+            sps[ci] += 1
+    colorstats[ci, K_ROT] += 1
+
+
+def op_not(colortoexec: str, ci: int):
+    if sps[ci] >= 1:
+        stacks[ci, sps[ci] - 1] = ~ stacks[ci, sps[ci] - 1]
+    colorstats[ci, K_NOT] += 1
+
+
+def op_gt(colortoexec: str, ci: int):
+    if sps[ci] >= 2:
+        sps[ci] -= 1
+        stacks[ci, sps[ci] - 1] = 1 if stacks[ci, sps[ci]] > stacks[ci, sps[ci] - 1] else 0
+    colorstats[ci, K_GT] += 1
+
+
+def op_eq(colortoexec: str, ci: int):
+    if sps[ci] >= 2:
+        sps[ci] -= 1
+        stacks[ci, sps[ci] - 1] = 1 if stacks[ci, sps[ci]] == stacks[ci, sps[ci] - 1] else 0
+    colorstats[ci, K_EQ] += 1
+
+
+def op_lt(colortoexec: str, ci: int):
+    if sps[ci] >= 2:
+        sps[ci] -= 1
+        stacks[ci, sps[ci] - 1] = 1 if stacks[ci, sps[ci]] < stacks[ci, sps[ci] - 1] else 0
+    colorstats[ci, K_LT] += 1
+
+
+def op_jmpz(colortoexec: str, ci: int):
+    if sps[ci] >= 2:
+        sps[ci] -= 2
+        value = int(stacks[ci, sps[ci] + 1])
+        address = int(stacks[ci, sps[ci]])
+        if value == 0:
+            if 0 <= address < size:
+                colorip[colortoexec] = address
+            else:
+                # Out of range, send the thread to the overrun sentinel
+                colorip[colortoexec] = size
+    colorstats[ci, K_JMPZ] += 1
+
+
+def op_jmpnz(colortoexec: str, ci: int):
+    if sps[ci] >= 2:
+        sps[ci] -= 2
+        value = int(stacks[ci, sps[ci] + 1])
+        address = int(stacks[ci, sps[ci]])
+        if value != 0:
+            if 0 <= address < size:
+                colorip[colortoexec] = address
+            else:
+                # Out of range, send the thread to the overrun sentinel
+                colorip[colortoexec] = size
+    colorstats[ci, K_JMPNZ] += 1
+
+
+def op_outc(colortoexec: str, ci: int):
+    if sps[ci] >= 1:
+        sps[ci] -= 1
+        char=str(chr(int(stacks[ci, sps[ci]])))
+        if char.isascii() is True :
+            outbuf.write(char)
+    colorstats[ci, K_OUTC] += 1
+
+
+def op_inc(colortoexec: str, ci: int):
+    flushout()
+    char=input(f"Char input for channel '{colortoexec}': ")
+    stacks[ci, sps[ci]] = ord(char[0])
+    sps[ci] += 1
+    colorstats[ci, K_INC] += 1
+
+
+def op_outi(colortoexec: str, ci: int):
+    if sps[ci] >= 1:
+        sps[ci] -= 1
+        number=int(stacks[ci, sps[ci]])
+        outbuf.write(f"{number}\n")
+    colorstats[ci, K_OUTI] += 1
+
+
+def op_ini(colortoexec: str, ci: int):
+    flushout()
+    value=input(f"Integer input for channel '{colortoexec}': ")
+    if value.isdecimal() is True and int(value) <= INT64_MAX :
+        stacks[ci, sps[ci]] = int(value)
+        sps[ci] += 1
+    colorstats[ci, K_INI] += 1
+
+
+def op_pusha(colortoexec: str, ci: int):
+    if sps[ci] >= 1:
+        if sps[3] >= STACK_MAX:
+            mesg(f"Stack limit of {STACK_MAX} reached in 'a' channel at {colorip[colortoexec] - 1} position.\nHalting channel '{colortoexec}'.")
+            colorstate[colortoexec] = HALTED
+            return
+        sps[ci] -= 1
+        stacks[3, sps[3]] = stacks[ci, sps[ci]]
+        sps[3] += 1
+    colorstats[ci, K_PUSHA] += 1
+
+
+def op_waita(colortoexec: str, ci: int):
+    if sps[3] >= 1:
+        sps[3] -= 1
+        stacks[ci, sps[ci]] = stacks[3, sps[3]]
+        sps[ci] += 1
+        colorstate[colortoexec] = RUNNING
+    else:
+        # We have to stay at the same place, so step the pre-advanced instruction pointer back
+        colorstate[colortoexec] = AWAIT
+        waitstack.append(colortoexec)
+        colorip[colortoexec] -= 1
+    colorstats[ci, K_WAITA] += 1
+
+
+def op_neg(colortoexec: str, ci: int):
+    if sps[ci] >= 1:
+        stacks[ci, sps[ci] - 1] = 0 - stacks[ci, sps[ci] - 1]
+    colorstats[ci, K_NEG] += 1
+
+
+def op_invalid(colortoexec: str, ci: int):
+    # The instruction pointer is already advanced past the offending cell
+    pos = colorip[colortoexec] - 1
+    mesg(f"Invalid instruction {colorcode[colortoexec][pos]} in '{colortoexec}' channel at {pos} position for ColorVM v{V_MAJOR}.{V_MINOR}.\nHalting channel '{colortoexec}'.")
+    colorstate[colortoexec] = HALTED
+
+
+# The opcode handler dispatch list, indexed by the decoded kind
+#  push (K_PUSH) is handled inline in colorexec, nop and halt in the main
+#  sequence, so their slots fall through to op_invalid and are never reached
+handlerlist: list[Callable[[str, int], None]] = [
+    make_binop(operator.add, K_ADD),       # K_ADD
+    make_binop(operator.sub, K_SUB),       # K_SUB
+    make_binop(operator.mul, K_MUL),       # K_MUL
+    make_binop(intdiv, K_DIV),             # K_DIV
+    make_binop(intrem, K_REM),             # K_REM
+    op_pop,                                # K_POP
+    op_swap,                               # K_SWAP
+    op_dup,                                # K_DUP
+    op_rot,                                # K_ROT
+    op_not,                                # K_NOT
+    make_binop(operator.or_, K_OR),        # K_OR
+    make_binop(operator.and_, K_AND),      # K_AND
+    op_gt,                                 # K_GT
+    op_eq,                                 # K_EQ
+    op_lt,                                 # K_LT
+    op_invalid,                            # K_NOP
+    op_invalid,                            # K_HALT
+    op_jmpz,                               # K_JMPZ
+    op_jmpnz,                              # K_JMPNZ
+    op_outc,                               # K_OUTC
+    op_inc,                                # K_INC
+    op_outi,                               # K_OUTI
+    op_ini,                                # K_INI
+    op_pusha,                              # K_PUSHA
+    op_waita,                              # K_WAITA
+    op_neg,                                # K_NEG
+    make_binop(shiftl, K_SHL),             # K_SHL
+    make_binop(shiftr, K_SHR),             # K_SHR
+    op_invalid,                            # K_PUSH
+    op_invalid,                            # K_INVALID
+    op_invalid                             # K_OVERRUN (handled in the main sequence)
+]
+
+
+def colorexec(colortoexec: str):
+    global args
+    ci = colorindex[colortoexec]
+    ip = colorip[colortoexec]
+    kind, imm = colordecoded[colortoexec][ip]
+    if kind in growkinds and sps[ci] >= STACK_MAX:
+        # No room for the value a growing instruction would push
+        mesg(f"Stack limit of {STACK_MAX} reached in '{colortoexec}' channel at {ip} position.\nHalting channel '{colortoexec}'.")
+        colorstate[colortoexec] = HALTED
+    elif kind == K_PUSH :
+        debuglog(f"  Instruction: push {str(imm)}", colorstyles[colortoexec])
+        stacks[ci, sps[ci]] = imm
+        sps[ci] += 1
+        colorstats[ci, K_PUSH] += 1
+        colorip[colortoexec] = ip + 1
+    else:
+        debuglog(f"  Instruction: {disasmdict.get(colorcode[colortoexec][ip])}", colorstyles[colortoexec])
+        # The instruction pointer is pre-advanced to the next cell, so the jump
+        # handlers just overwrite it with their target
+        colorip[colortoexec] = ip + 1
+        handlerlist[kind](colortoexec, ci)
+    if args.debug is True:
+        stacktable = Table(title="Stack dump")
+        stacktable.add_column("Position", justify="left", style=table_info_style)
+        stacktable.add_column("r", justify="right", style=red_style)
+        stacktable.add_column("g", justify="right", style=green_style)
+        stacktable.add_column("b", justify="right", style=blue_style)
+        stacktable.add_column("a", justify="right", style=alpha_style)
+        for pos, sval in enumerate(zip_longest(stacks[0, :sps[0]], stacks[1, :sps[1]], stacks[2, :sps[2]], stacks[3, :sps[3]], fillvalue='-')):
+            stacktable.add_row(f"{pos}", f"{sval[0]}", f"{sval[1]}", f"{sval[2]}", f"{sval[3]}")
+        debuglog(f"", colorstyles[colortoexec])
+        console.print(stacktable)
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def run_vm(kinds, imms, ips, states, stacks, sps, stats, waitq, size, startc):
+        # Compiled main sequence
+        #  kinds/imms are the decoded int64[3, size] cells, stacks int64[4, STACK_MAX]
+        #  (3 is the alpha stack), sps the stack pointers, stats the kind-indexed
+        #  counters and waitq a small FIFO (slots 0..2 plus the count in slot 3)
+        c = startc
+        while True:
+            # A round may be entered partway through when Python hands control
+            # back after a bail-out, so the interrupted turn order is kept
+            while c < 3:
+                if states[c] == RUNNING:
+                    ip = ips[c]
+                    kind = kinds[c, ip]
+                    if kind == K_OVERRUN:
+                        # The sentinel cell behind the last line
+                        states[c] = OVERRUN
+                    elif kind == K_HALT:
+                        # halt
+                        stats[c, 16] += 1
+                        states[c] = HALTED
+                    elif kind == K_OUTC or kind == K_INC or kind == K_OUTI or kind == K_INI:
+                        # outc/inc/outi/ini go through Python
+                        return R_IO, c
+                    elif kind == K_INVALID:
+                        # Let Python print the message and halt the channel
+                        return R_INVALID, c
+                    elif (kind == K_PUSH or kind == K_DUP or kind == K_WAITA) and sps[c] >= STACK_MAX:
+                        # No room for the value a growing instruction would push,
+                        # let Python report it; inc/ini bail out as I/O above and
+                        # fastexec applies the same test
+                        return R_STACKFULL, c
+                    else:
+                        # The instruction pointer is pre-advanced to the next cell,
+                        # so the jumps just overwrite it with their target
+                        ips[c] = ip + 1
+                        if kind == K_NOP:
+                            # nop
+                            stats[c, 15] += 1
+                        elif kind == K_PUSH:
+                            # push
+                            stacks[c, sps[c]] = imms[c, ip]
+                            sps[c] += 1
+                            stats[c, 28] += 1
+                        elif kind == K_ADD:
+                            # add
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c]] + stacks[c, sps[c] - 1]
+                            stats[c, 0] += 1
+                        elif kind == K_SUB:
+                            # sub
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c]] - stacks[c, sps[c] - 1]
+                            stats[c, 1] += 1
+                        elif kind == K_MUL:
+                            # mul
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c]] * stacks[c, sps[c] - 1]
+                            stats[c, 2] += 1
+                        elif kind == K_DIV:
+                            # div, division by zero produces 0
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                divisor = stacks[c, sps[c] - 1]
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c]] // divisor if divisor != 0 else 0
+                            stats[c, 3] += 1
+                        elif kind == K_REM:
+                            # rem, remainder by zero produces 0
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                divisor = stacks[c, sps[c] - 1]
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c]] % divisor if divisor != 0 else 0
+                            stats[c, 4] += 1
+                        elif kind == K_POP:
+                            # pop
+                            if sps[c] >= 1:
+                                sps[c] -= 1
+                            stats[c, 5] += 1
+                        elif kind == K_SWAP:
+                            # swap
+                            if sps[c] >= 2:
+                                a = stacks[c, sps[c] - 1]
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c] - 2]
+                                stacks[c, sps[c] - 2] = a
+                            stats[c, 6] += 1
+                        elif kind == K_DUP:
+                            # dup
+                            if sps[c] >= 1:
+                                stacks[c, sps[c]] = stacks[c, sps[c] - 1]
+                                sps[c] += 1
+                            stats[c, 7] += 1
+                        elif kind == K_ROT:
+                            # rot
+                            if sps[c] >= 1:
+                                sps[c] -= 1
+                                torot = stacks[c, sps[c]]
+                                if sps[c] >= torot:
+                                    sps[c] -= 1
+                                    extract = stacks[c, sps[c]]
+                                    # Same position as list.insert in the Python handler, clamped to an append
+                                    pos = sps[c] + 1 - torot
+                                    if pos > sps[c]:
+                                        pos = sps[c]
+                                    for j in range(sps[c], pos, -1):
+                                        stacks[c, j] = stacks[c, j - 1]
+                                    stacks[c, pos] = extract
+                                    sps[c] += 1
+                            stats[c, 8] += 1
+                        elif kind == K_NOT:
+                            # not
+                            if sps[c] >= 1:
+                                stacks[c, sps[c] - 1] = ~ stacks[c, sps[c] - 1]
+                            stats[c, 9] += 1
+                        elif kind == K_OR:
+                            # or
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c]] | stacks[c, sps[c] - 1]
+                            stats[c, 10] += 1
+                        elif kind == K_AND:
+                            # and
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c]] & stacks[c, sps[c] - 1]
+                            stats[c, 11] += 1
+                        elif kind == K_GT:
+                            # gt
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                stacks[c, sps[c] - 1] = 1 if stacks[c, sps[c]] > stacks[c, sps[c] - 1] else 0
+                            stats[c, 12] += 1
+                        elif kind == K_EQ:
+                            # eq
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                stacks[c, sps[c] - 1] = 1 if stacks[c, sps[c]] == stacks[c, sps[c] - 1] else 0
+                            stats[c, 13] += 1
+                        elif kind == K_LT:
+                            # lt
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                stacks[c, sps[c] - 1] = 1 if stacks[c, sps[c]] < stacks[c, sps[c] - 1] else 0
+                            stats[c, 14] += 1
+                        elif kind == K_JMPZ:
+                            # jmpz
+                            if sps[c] >= 2:
+                                sps[c] -= 2
+                                value = stacks[c, sps[c] + 1]
+                                address = stacks[c, sps[c]]
+                                if value == 0:
+                                    if 0 <= address < size:
+                                        ips[c] = address
+                                    else:
+                                        # Out of range, send the thread to the overrun sentinel
+                                        ips[c] = size
+                            stats[c, 17] += 1
+                        elif kind == K_JMPNZ:
+                            # jmpnz
+                            if sps[c] >= 2:
+                                sps[c] -= 2
+                                value = stacks[c, sps[c] + 1]
+                                address = stacks[c, sps[c]]
+                                if value != 0:
+                                    if 0 <= address < size:
+                                        ips[c] = address
+                                    else:
+                                        # Out of range, send the thread to the overrun sentinel
+                                        ips[c] = size
+                            stats[c, 18] += 1
+                        elif kind == K_PUSHA:
+                            # pusha
+                            if sps[c] >= 1:
+                                if sps[3] >= STACK_MAX:
+                                    # The alpha stack gets its own report
+                                    return R_ALPHAFULL, c
+                                sps[c] -= 1
+                                stacks[3, sps[3]] = stacks[c, sps[c]]
+                                sps[3] += 1
+                            stats[c, 23] += 1
+                        elif kind == K_WAITA:
+                            # waita
+                            if sps[3] >= 1:
+                                sps[3] -= 1
+                                stacks[c, sps[c]] = stacks[3, sps[3]]
+                                sps[c] += 1
+                                states[c] = RUNNING
+                            else:
+                                # We have to stay at the same place, so step the pre-advanced instruction pointer back
+                                states[c] = AWAIT
+                                waitq[waitq[3]] = c
+                                waitq[3] += 1
+                                ips[c] = ip
+                            stats[c, 24] += 1
+                        elif kind == K_NEG:
+                            # neg
+                            if sps[c] >= 1:
+                                stacks[c, sps[c] - 1] = 0 - stacks[c, sps[c] - 1]
+                            stats[c, 25] += 1
+                        elif kind == K_SHL:
+                            # shl, shift counts outside 0..63 produce 0
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                count = stacks[c, sps[c]]
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c] - 1] << count if 0 <= count <= 63 else 0
+                            stats[c, 26] += 1
+                        elif kind == K_SHR:
+                            # shr, shift counts outside 0..63 produce 0
+                            if sps[c] >= 2:
+                                sps[c] -= 1
+                                count = stacks[c, sps[c]]
+                                stacks[c, sps[c] - 1] = stacks[c, sps[c] - 1] >> count if 0 <= count <= 63 else 0
+                            stats[c, 27] += 1
+                elif states[c] == AWAIT and waitq[3] > 0 and waitq[0] == c:
+                    stats[c, 24] += 1
+                    if sps[3] >= 1:
+                        # Pop the wait queue head and re-execute the waita with the data available
+                        waitq[0] = waitq[1]
+                        waitq[1] = waitq[2]
+                        waitq[3] -= 1
+                        if sps[c] >= STACK_MAX:
+                            # Halt with the queue entry consumed, like the Python path
+                            return R_STACKFULL, c
+                        sps[3] -= 1
+                        stacks[c, sps[c]] = stacks[3, sps[3]]
+                        sps[c] += 1
+                        states[c] = RUNNING
+                        stats[c, 24] += 1
+                        ips[c] += 1
+                c += 1
+            tmprun = 0
+            tmpawait = 0
+            for c in range(3):
+                if states[c] == RUNNING:
+                    tmprun += 1
+                elif states[c] == AWAIT:
+                    tmpawait += 1
+            if tmprun == 0:
+                if tmpawait != 0:
+                    return R_DEADLOCK, 0
+                return R_HALT, 0
+            c = 0
+
+
+def fastexec():
+    global args
+    kinds = codekinds
+    imms = codeimms
+    ips = np.zeros(3, dtype=np.int64)
+    states = np.full(3, RUNNING, dtype=np.int64)
+    waitq = np.zeros(4, dtype=np.int64)
+    startc = 0
+    while True:
+        reason, ci = run_vm(kinds, imms, ips, states, stacks, sps, colorstats, waitq, size, startc)
+        if reason == R_IO:
+            color = colors[ci]
+            kind = int(kinds[ci, ips[ci]])
+            if kind == K_OUTC:
+                # outc
+                if sps[ci] >= 1:
+                    sps[ci] -= 1
+                    char=str(chr(int(stacks[ci, sps[ci]])))
+                    if char.isascii() is True :
+                        outbuf.write(char)
+            elif kind == K_INC:
+                # inc
+                #  run_vm bails out for I/O before its stack-limit check, so the
+                #  headroom test happens here, as colorexec would
+                if sps[ci] >= STACK_MAX:
+                    mesg(f"Stack limit of {STACK_MAX} reached in '{color}' channel at {int(ips[ci])} position.\nHalting channel '{color}'.")
+                    states[ci] = HALTED
+                    startc = ci + 1
+                    continue
+                flushout()
+                char=input(f"Char input for channel '{color}': ")
+                stacks[ci, sps[ci]] = ord(char[0])
+                sps[ci] += 1
+            elif kind == K_OUTI:
+                # outi
+                if sps[ci] >= 1:
+                    sps[ci] -= 1
+                    number=int(stacks[ci, sps[ci]])
+                    outbuf.write(f"{number}\n")
+            elif kind == K_INI:
+                # ini
+                if sps[ci] >= STACK_MAX:
+                    mesg(f"Stack limit of {STACK_MAX} reached in '{color}' channel at {int(ips[ci])} position.\nHalting channel '{color}'.")
+                    states[ci] = HALTED
+                    startc = ci + 1
+                    continue
+                flushout()
+                value=input(f"Integer input for channel '{color}': ")
+                if value.isdecimal() is True and int(value) <= INT64_MAX :
+                    stacks[ci, sps[ci]] = int(value)
+                    sps[ci] += 1
+            colorstats[ci, kind] += 1
+            ips[ci] += 1
+            startc = ci + 1
+        elif reason == R_INVALID:
+            color = colors[ci]
+            mesg(f"Invalid instruction {colorcode[color][int(ips[ci])]} in '{color}' channel at {int(ips[ci])} position for ColorVM v{V_MAJOR}.{V_MINOR}.\nHalting channel '{color}'.")
+            states[ci] = HALTED
+            startc = ci + 1
+        elif reason == R_STACKFULL:
+            color = colors[ci]
+            mesg(f"Stack limit of {STACK_MAX} reached in '{color}' channel at {int(ips[ci])} position.\nHalting channel '{color}'.")
+            states[ci] = HALTED
+            startc = ci + 1
+        elif reason == R_ALPHAFULL:
+            color = colors[ci]
+            # The instruction pointer is already pre-advanced past the pusha
+            mesg(f"Stack limit of {STACK_MAX} reached in 'a' channel at {int(ips[ci]) - 1} position.\nHalting channel '{color}'.")
+            states[ci] = HALTED
+            startc = ci + 1
+        elif reason == R_DEADLOCK:
+            mesg("Thread deadlock. Exiting.")
+            break
+        else:
+            mesg("Threads halted. Exiting.")
+            break
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename')
+    parser.add_argument('-b', '--bytedump', action='store_true', default=False, help='no execution, just dumping the bytearray in text')
+    parser.add_argument('-d', '--disasm', action='store_true', default=False, help='no execution, just disassembling the program')
+    parser.add_argument('-s', '--silent', action='store_true', default=False, help='silent run, no warnings or errors')
+    parser.add_argument('-t', '--statistics', action='store_true', default=False, help='display execution statistics after the termination of the VM')
+    parser.add_argument('-g', '--debug', action='store_true', default=False, help='provide detailed debug output')
+    args = parser.parse_args()
+
+    # Rebinding the silenced logging helpers to a no-op up front, so the hot
+    # path never pays for building output that would not be printed anyway
+    if args.silent is True:
+        mesg = nolog
+    if args.debug is False:
+        debuglog = nolog
+
+    path = pathlib.Path(args.filename)
+
+    if path.exists() and path.is_file():
+        img = Image.open(path, mode='r')
+        imgxsize = img.size[0]
+        imgysize = img.size[1]
+        (majorver, minorver, cellsize) = img.getpixel((0, 0))
+        debuglog(f"Version: {majorver}.{minorver}, cellsize: {cellsize}", important_style)
+        if (majorver > V_MAJOR) or (majorver == V_MAJOR and minorver > V_MINOR):
+            mesg(f"Invalid version {majorver}.{minorver}, maximum supported: {V_MAJOR}.{V_MINOR}")
+            exit()
+        if imgxsize == cellsize:
+            (size3, size2, size1) = img.getpixel((0, cellsize))
+        else:
+            (size3, size2, size1) = img.getpixel((cellsize, 0))
+        size = size3 * 256 * 256 + size2 * 256 + size1
+        debuglog(f"Program size: {size}", important_style)
+        match size:
+            case 0:
+                mesg(f"File {args.filename} length is zero.")
+                exit()
+            case 1:
+                x = 0
+                y = 2 * cellsize
+            case 2 | 3 | 4 | 5 | 6 :
+                x = 0
+                y = cellsize
+            case _:
+                x = 2 * cellsize
+                y = 0
+        # Reading the pixels into the packed code array: the image data is
+        # fetched once and the cell coordinates are generated in one shot, so
+        # there are no per-cell getpixel round trips or traversal loop at all
+        arr = np.asarray(img, dtype=np.uint8)
+        ncols = (imgxsize - 1) // cellsize + 1
+        idx = np.arange(size) + x // cellsize + (y // cellsize) * ncols
+        ys = (idx // ncols) * cellsize
+        xs = (idx % ncols) * cellsize
+        codecells = arr[ys, xs, :3]
+        colorcode['r'] = np.ascontiguousarray(codecells[:, 0])
+        colorcode['g'] = np.ascontiguousarray(codecells[:, 1])
+        colorcode['b'] = np.ascontiguousarray(codecells[:, 2])
+        # Pre-decoding every cell into (kind, immediate) in one vectorized pass
+        # through kindtable, so execution never re-interprets the raw byte on a
+        # revisit and the load does no per-cell dict hashing
+        # and every channel gets a K_OVERRUN sentinel cell behind its last
+        # line, so running or jumping off the end needs no bounds check
+        codekinds = np.hstack((np.where(codecells < 128, K_PUSH, kindtable[codecells]).T, np.full((3, 1), K_OVERRUN, dtype=np.int64)))
+        codeimms = np.hstack((np.where(codecells < 128, codecells, 0).T.astype(np.int64), np.zeros((3, 1), dtype=np.int64)))
+        for ci, color in enumerate(colors):
+            colordecoded[color] = list(zip(codekinds[ci].tolist(), codeimms[ci].tolist()))
+        # Trace-compiling straight-line blocks for the Python interpreter;
+        # pointless under --debug (which logs per instruction) or when the
+        # Numba fast path takes over anyway
+        if numba is None and args.debug is False:
+            compileblocks()
+        # Bytedump mode
+        if args.bytedump is True:
+            i = 0
+            print(f"Dumping {args.filename}")
+            print(f"ColorVM version: {V_MAJOR}.{V_MINOR}")
+            print(f"Image file version: {majorver}.{minorver}, Cell size: {cellsize}\n")
+            while i < size:
+                print(f"Line {i}: [{colorcode["r"][i]}, {colorcode["g"][i]}, {colorcode["b"][i]}]")
+                i += 1
+            exit()
+        # Disasm mode
+        if args.disasm is True:
+            print(f"#Disassembling {args.filename}")
+            print(f"#ColorVM version: {V_MAJOR}.{V_MINOR}")
+            print(f"#Image file version: {majorver}.{minorver}, Cell size: {cellsize}\n")
+            # One disassembly string per opcode byte, so every cell is a single
+            # list index instead of dict probes, and the whole dump is one print
+            disasmtable = ["push " + str(op) if disasmdict.get(op) is None else disasmdict[op] for op in range(256)]
+            print("\n".join(f"{disasmtable[r]:9}; {disasmtable[g]:9}; {disasmtable[b]:9} #Line {i}" for i, (r, g, b) in enumerate(codecells.tolist())))
+            exit()
+        # Main sequence
+        #  The Numba fast path produces no per-instruction debug output, so it only runs without --debug
+        if numba is not None and args.debug is False:
+            fastexec()
+        else:
+            # The driver is generated now that the program size is known
+            pyexec = makedriver()
+            pyexec()
+        # Push out whatever buffered program output is left
+        flushout()
+        if args.statistics is True:
+            insttable = Table(title="Execution statistics")
+            insttable.add_column("Instruction", justify="left", style=table_info_style)
+            insttable.add_column("r", justify="right", style=red_style)
+            insttable.add_column("g", justify="right", style=green_style)
+            insttable.add_column("b", justify="right", style=blue_style)
+            instlines = []
+            for kind, key in enumerate(kindnames):
+                if colorstats[0, kind] != 0 or colorstats[1, kind] != 0 or colorstats[2, kind] != 0:
+                    instlines.append((key, colorstats[0, kind], colorstats[1, kind], colorstats[2, kind]))
+            instline_sorted = sorted(instlines, key=lambda instline: instline[0])
+            for line in instline_sorted:
+                insttable.add_row(f"{line[0]}", f"{line[1]}", f"{line[2]}", f"{line[3]}")
+            console.print(insttable)
+    else:
         mesg(f"File {args.filename} not found.")
\ No newline at end of file